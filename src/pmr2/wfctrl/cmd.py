@@ -9,6 +9,7 @@ else:  # pragma: no cover
     from ConfigParser import ConfigParser
 
 from pmr2.wfctrl.core import BaseDvcsCmdBin, register_cmd, BaseDvcsCmd
+from pmr2.wfctrl.core import _as_paths
 
 try:
     from dulwich import porcelain
@@ -37,7 +38,7 @@ class DemoDvcsCmd(BaseDvcsCmdBin):
         self.queue.append([self.binary, 'init', workspace.working_dir])
 
     def add(self, workspace, path, **kw):
-        self.queue.append([self.binary, 'add', path])
+        self.queue.append([self.binary, 'add'] + _as_paths(path))
 
     def commit(self, workspace, message, **kw):
         self.queue.append([self.binary, 'commit', '-m', message])
@@ -79,7 +80,8 @@ class MercurialDvcsCmd(BaseDvcsCmdBin):
         return self.execute('init', workspace.working_dir)
 
     def add(self, workspace, path, **kw):
-        return self.execute(*self._args(workspace, 'add', path))
+        return self.execute_paths(
+            self._args(workspace, 'add'), _as_paths(path))
 
     def commit(self, workspace, message, **kw):
         # XXX need to customize the user name
@@ -153,17 +155,27 @@ class GitDvcsCmd(BaseDvcsCmdBin):
     def init_new(self, workspace, **kw):
         return self.execute('init', workspace.working_dir)
 
+    def _add_args(self, workspace, paths):
+        return self._args(workspace, 'add', '--', *paths)
+
     def add(self, workspace, path, **kw):
-        return self.execute(*self._args(workspace, 'add', path))
+        return self.execute_paths(
+            self._add_args(workspace, []), _as_paths(path))
 
-    def commit(self, workspace, message, **kw):
-        # XXX no temporary override as far as I know.
+    def _commit_args(self, workspace, message):
+        # Temporary override through -c, which saves the separate calls
+        # to git config before the commit.
         name, email = self._committer
+        args = []
         if name:
-            self.execute(*self._args(workspace, 'config', 'user.name', name))
+            args.extend(['-c', 'user.name=%s' % name])
         if email:
-            self.execute(*self._args(workspace, 'config', 'user.email', email))
-        return self.execute(*self._args(workspace, 'commit', '-m', message))
+            args.extend(['-c', 'user.email=%s' % email])
+        args.extend(['commit', '-m', message])
+        return self._args(workspace, *args)
+
+    def commit(self, workspace, message, **kw):
+        return self.execute(*self._commit_args(workspace, message))
 
     def read_remote(self, workspace, target_remote=None, **kw):
         target_remote = target_remote or self.default_remote
@@ -190,21 +202,25 @@ class GitDvcsCmd(BaseDvcsCmdBin):
         args = self._args(workspace, 'pull', target)
         return self.execute(*args)
 
+    def _push_args(self, workspace, push_target, branches=None, **kw):
+        args = self._args(workspace, 'push', push_target)
+        if not branches:
+            args.append('--all')
+        elif isinstance(branches, list):  # pragma: no cover
+            args.extend(branches)
+        return args
+
     def push(self, workspace, username=None, password=None, branches=None,
              **kw):
         """
         branches
             A list of branches to push.  Defaults to --all
         """
+
         push_target = self.get_remote(workspace,
                                       username=username, password=password)
-        args = self._args(workspace, 'push', push_target)
-        if not branches:
-            args.append('--all')
-        elif isinstance(branches, list):  # pragma: no cover
-            args.extend(branches)
-
-        return self.execute(*args)
+        return self.execute(*self._push_args(
+            workspace, push_target, branches=branches))
 
     def reset_to_remote(self, workspace, branch=None):
         # XXX not actually resetting to remote
@@ -249,7 +265,8 @@ class DulwichDvcsCmd(BaseDvcsCmd):
         return b'', b'', 0 if isdir(join(workspace.working_dir, self.marker)) else 1
 
     def add(self, workspace, path, **kw):
-        rel_paths, ignored = porcelain.add(repo=workspace.working_dir, paths=[path])
+        rel_paths, ignored = porcelain.add(
+            repo=workspace.working_dir, paths=_as_paths(path))
         return '\n'.join(rel_paths).encode(), '\n'.join(ignored).encode(), 0
 
     def commit(self, workspace, message, **kw):
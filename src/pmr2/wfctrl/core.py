@@ -1,15 +1,51 @@
 import os
-from os.path import abspath, isabs, isdir, join, normpath, relpath
+import stat
+from functools import lru_cache
+from os.path import abspath, isabs, join, normpath, relpath
 import logging
+from shlex import quote
 from subprocess import Popen, PIPE
 
 from .utils import set_url_cred
 
 logger = logging.getLogger(__name__)
 
-def dummy_action(workspace):
+# Conservative limit on the combined length of the paths passed to a
+# single external command invocation.
+_ARG_MAX = 32000 if os.name == 'nt' else 131072
+
+def dummy_action(workspace, **kw):
     return
 
+def _as_paths(path):
+    """
+    Return a list of paths from either a single path or an iterable of
+    paths.
+    """
+
+    if isinstance(path, (str, bytes, os.PathLike)):
+        return [path]
+    return list(path)
+
+def _chunk_paths(paths, limit=_ARG_MAX):
+    """
+    Split paths into lists whose combined length in bytes stays within
+    limit.
+    """
+
+    chunk = []
+    size = 0
+    for path in paths:
+        length = len(os.fsencode(path)) + 1
+        if chunk and size + length > limit:
+            yield chunk
+            chunk = []
+            size = 0
+        chunk.append(path)
+        size += length
+    if chunk:
+        yield chunk
+
 _cmd_classes = {}
 _cmd_names = {}
 
@@ -27,21 +63,71 @@ def register_cmd(*cmd_classes):
 def get_cmd_by_name(cmd_name):
     return _cmd_names.get(cmd_name)
 
+def _isdir(path, _stat=os.stat, _S_ISDIR=stat.S_ISDIR):
+    """
+    Equivalent of os.path.isdir with the stat call made directly.
+    """
+
+    try:
+        return _S_ISDIR(_stat(path).st_mode)
+    except (OSError, ValueError):
+        return False
+
+def _fast_normpath(path, _normpath=normpath):
+    """
+    Skip normpath for the common case of a path that has nothing to
+    normalize.  Only applies to POSIX style separators, everything else
+    gets the full normpath treatment.
+    """
+
+    if (os.sep == '/' and '//' not in path and '/./' not in path and
+            '/../' not in path and not path.endswith(('/', '/.', '/..'))):
+        return path
+    return _normpath(path)
+
+@lru_cache(maxsize=4096)
+def _resolve_filename(working_dir, filename,
+        _isabs=isabs, _join=join, _fast_normpath=_fast_normpath):
+    """
+    Resolve filename against an absolute working_dir.  Memoized as the
+    same paths tend to get added repeatedly.
+    """
+
+    if not _isabs(filename):
+        # Normalize a relative path into absolute path based inside
+        # the workspace working dir.  As working_dir is already
+        # absolute there is no need for abspath (and its getcwd).
+        filename = _fast_normpath(_join(working_dir, filename))
+    return filename
+
 
 class BaseWorkspace(object):
     """
     Base workspace object
     """
 
+    __slots__ = ('working_dir', 'files', '_sorted', '_wd_prefix',
+                 '__weakref__')
+
     marker = None
-    files = None
 
     def __init__(self, working_dir, **kw):
-        self.working_dir = abspath(normpath(working_dir))
+        if isabs(working_dir):
+            self.working_dir = normpath(working_dir)
+        else:
+            self.working_dir = abspath(working_dir)
+        # Cached prefix for the containment check in add_file; join
+        # with an empty component so that a root working_dir does not
+        # end up with a doubled separator.
+        self._wd_prefix = join(self.working_dir, '')
         self.reset()
 
     def reset(self):
-        self.files = set()
+        # A dict is used as an insertion ordered set.
+        self.files = {}
+        # Sorted copy built by get_tracked_subpaths, kept until the
+        # tracked files change.
+        self._sorted = None
 
     def initialize(self, **kw):
         # Unused here.
@@ -51,23 +137,37 @@ class BaseWorkspace(object):
         # Unused here.
         raise NotImplementedError
 
-    def add_file(self, filename):
+    # The default arguments bind the helper as a local name as this is
+    # called for every file added.
+    def add_file(self, filename, _resolve_filename=_resolve_filename):
         """
         Add a file.  Should be relative to the root of the working_dir.
         """
 
-        if not isabs(filename):
-            # Normalize a relative path into absolute path based inside
-            # the workspace working dir.
-            filename = abspath(normpath(join(self.working_dir, filename)))
-
-        if not filename.startswith(self.working_dir):
+        filename = _resolve_filename(self.working_dir, filename)
+        # Either the working_dir itself or anything inside it, but not
+        # a sibling that merely shares its name as a prefix.
+        if not (filename.startswith(self._wd_prefix) or
+                filename == self.working_dir):
             raise ValueError('filename not inside working dir')
 
-        self.files.add(filename)
+        if filename in self.files:
+            return
+        self.files[filename] = None
+        self._sorted = None
 
     def get_tracked_subpaths(self):
-        return sorted(list(self.files))
+        if self._sorted is None:
+            self._sorted = sorted(self.files)
+        return list(self._sorted)
+
+    def iter_tracked_subpaths(self):
+        """
+        Iterate through the tracked paths in the order they were added,
+        for callers that do not need them sorted.
+        """
+
+        return iter(self.files.keys())
 
     def save(self, **kw):
         raise NotImplementedError
@@ -78,6 +178,8 @@ class Workspace(BaseWorkspace):
     Default workspace, file based.
     """
 
+    __slots__ = ()
+
     def save(self, **kw):
         """
         They are already on filesystem, do nothing.
@@ -89,31 +191,48 @@ class CmdWorkspace(BaseWorkspace):
     Default workspace, file based.
     """
 
+    __slots__ = ('cmd', 'cmd_table', '_marker_path', '_marker_exists',
+                 '_init_cmd', '_save_cmd')
+
     def __init__(self, working_dir, cmd=None, auto=False, **kw):
         """
-        marker
-            The marker path that denotes that this was already
-            initialized.
         cmd
-            A command object
+            A command object.  Its marker is the path that denotes that
+            this was already initialized; no marker means there is
+            nothing to initialize.
+        auto
+            Select the command object from the registered markers found
+            inside the working_dir.
         """
 
         BaseWorkspace.__init__(self, working_dir)
+        found = False
         if auto:
             for marker, cls in _cmd_classes.items():
-                target = abspath(normpath(join(self.working_dir, marker)))
-                if not isdir(target):
+                # working_dir is already absolute and normalized.
+                target = join(self.working_dir, marker)
+                if not _isdir(target):
                     continue
                 cmd = cls()
+                found = cmd.marker == marker
                 break
         self.cmd = cmd
         self.update_cmd_table(cmd)
+        # just found, no need to check for it again.
+        self._marker_exists = found
         self.initialize()
 
     def update_cmd_table(self, cmd):
-        self.cmd_table = {}
-        if cmd:
-            self.cmd_table.update(cmd.cmd_table)
+        # Copied, as a command object may hand out a shared table.
+        self.cmd_table = dict(cmd.cmd_table) if cmd else {}
+        # Resolve the commands used by initialize and save once here.
+        self._init_cmd = self.cmd_table.get('init') or dummy_action
+        self._save_cmd = self.cmd_table.get('save') or dummy_action
+        # Likewise for the marker of the current cmd, which also means
+        # whether it was found before no longer applies.
+        marker = self.marker
+        self._marker_path = marker and join(self.working_dir, marker)
+        self._marker_exists = False
 
     def get_cmd(self, name):
         cmd = self.cmd_table.get(name)
@@ -127,24 +246,28 @@ class CmdWorkspace(BaseWorkspace):
         return self.cmd and self.cmd.marker or None
 
     def check_marker(self):
-        if self.marker is None:
+        if self._marker_path is None:
+            return True
+        if self._marker_exists:
+            # a marker that was found is assumed to stay.
             return True
-        target = join(self.working_dir, self.marker)
-        logger.debug('checking isdir: %s', target)
-        return isdir(target)
+        self._marker_exists = _isdir(self._marker_path)
+        return self._marker_exists
 
     def initialize(self, **kw):
-        if self.check_marker():
-            logger.debug('already initialized: %s', self.working_dir)
+        # An already initialized workspace does no further work here.
+        if self.check_marker() or self._init_cmd is dummy_action:
             return
-        return self.get_cmd('init')(self, **kw)
+        return self._init_cmd(self, **kw)
 
     def save(self, **kw):
         """
         They are already on filesystem, do nothing.
         """
 
-        return self.get_cmd('save')(self, **kw)
+        if self._save_cmd is dummy_action:
+            return
+        return self._save_cmd(self, **kw)
 
 
 class BaseCmd(object):
@@ -181,6 +304,8 @@ class BaseDvcsCmd(BaseCmd):
     name = '__base__'
     default_remote = None
     auto_push = True
+    # Whether save should be done through save_batched.
+    _supports_batch = False
 
     def __init__(self, remote=None):
         self.remote = remote
@@ -192,6 +317,11 @@ class BaseDvcsCmd(BaseCmd):
         raise NotImplementedError
 
     def add(self, workspace, path, **kw):
+        """
+        Add path to the repository.  path may also be an iterable of
+        paths, which should be added together in one go.
+        """
+
         raise NotImplementedError
 
     def commit(self, workspace, message, **kw):
@@ -229,9 +359,23 @@ class BaseDvcsCmd(BaseCmd):
             self.init_new(workspace)
 
     def save(self, workspace, message='', **kw):
-        for path in workspace.get_tracked_subpaths():
-            logger.debug('Add path={0}'.format(path))
-            self.add(workspace, path)
+        if self._supports_batch:
+            self.save_batched(workspace, message=message, **kw)
+        else:
+            self._save(workspace, message=message, **kw)
+
+    def save_batched(self, workspace, message='', **kw):
+        """
+        Save the workspace using a single external command invocation.
+        """
+
+        raise NotImplementedError
+
+    def _save(self, workspace, message='', **kw):
+        paths = list(workspace.iter_tracked_subpaths())
+        if paths:
+            logger.debug('Add paths={0}'.format(paths))
+            self.add(workspace, paths)
         # XXX return these results.
         self.commit(workspace, message)
         self.update_remote(workspace)
@@ -328,10 +472,104 @@ class BaseDvcsCmdBin(BaseDvcsCmd):
         return self.available(cmd_binary=self.cmd_binary)
 
     # public instance method because instances always execute this.
-    def execute(self, *args):
+    def execute(self, *args, cmd_binary=None):
+        """
+        Executes an external command, using cmd_binary in place of the
+        one for this instance if provided.
+        """
+
+        return self._execute(
+            args=args, cmd_binary=cmd_binary or self.cmd_binary)
+
+    def execute_paths(self, args, paths):
+        """
+        Executes an external command with the paths appended to args.
+        Should the paths be too long for a single command line, they
+        are split across multiple invocations, with the outputs joined
+        and the first non-zero return code reported.
+
+        A single bad path (such as one that no longer exists) fails the
+        whole invocation, so should that happen the paths are retried
+        one at a time to let the others through.
+        """
+
+        stdout = []
+        stderr = []
+        return_code = 0
+        for chunk in _chunk_paths(paths):
+            results = [self.execute(*(list(args) + chunk))]
+            if results[0][2] and len(chunk) > 1:
+                results = [self.execute(*(list(args) + [path]))
+                           for path in chunk]
+            for out, err, code in results:
+                stdout.append(out)
+                stderr.append(err)
+                if code and not return_code:
+                    return_code = code
+        return b''.join(stdout), b''.join(stderr), return_code
+
+    def _add_args(self, workspace, paths):
+        """
+        Arguments for the add command, used by save_batched.
         """
-        Executes an external command.
+
+        raise NotImplementedError
+
+    def _commit_args(self, workspace, message):
+        """
+        Arguments for the commit command, used by save_batched.
         """
 
-        return self._execute(args=args, cmd_binary=self.cmd_binary)
+        raise NotImplementedError
 
+    def _push_args(self, workspace, push_target, **kw):
+        """
+        Arguments for the push command, used by save_batched.
+        """
+
+        raise NotImplementedError
+
+    def save_batched(self, workspace, message='', **kw):
+        """
+        Save the workspace by running the add, commit and push commands
+        in a single shell invocation.  As with the separate invocations
+        a failed add is retried one path at a time, and every command is
+        run regardless of how the previous ones went, so that a push
+        still happens when there was nothing new to commit.  Falls back to the separate invocations should the
+        script be too long for a single command line.
+        """
+
+        self.update_remote(workspace)
+        # update_remote leaves the remote that push would look up on the
+        # instance, so build the target from it rather than reading it
+        # from the repository again.
+        push_target = set_url_cred(self.remote or self.default_remote)
+        def command(args):
+            return ' '.join(quote(arg) for arg in [self.cmd_binary] + args)
+
+        paths = list(workspace.iter_tracked_subpaths())
+        commands = []
+        if paths:
+            add = command(self._add_args(workspace, paths))
+            if len(paths) > 1:
+                # As with execute_paths, retry the paths one at a time
+                # should adding them all at once fail.
+                add = '%s || { %s; }' % (add, '; '.join(
+                    command(self._add_args(workspace, [path]))
+                    for path in paths
+                ))
+            commands.append(add)
+        commands.append(command(self._commit_args(workspace, message)))
+        commands.append(command(self._push_args(workspace, push_target)))
+        script = '; '.join(commands)
+        # The kernel limits the length of a single argument in bytes,
+        # including the terminating NUL.
+        if len(os.fsencode(script)) + 1 > _ARG_MAX:
+            logger.debug('batched save too long, using separate commands')
+            self._save(workspace, message=message, **kw)
+            return
+        try:
+            self.execute('-c', script, cmd_binary='sh')
+        except OSError:
+            logger.debug('batched save failed, using separate commands')
+            self._save(workspace, message=message, **kw)
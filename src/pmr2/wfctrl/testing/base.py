@@ -76,6 +76,7 @@ class CoreTests(object):
         wks = self.make_workspace()
         filenames = self.add_files_multi(wks)
         self.assertEqual(wks.get_tracked_subpaths(), filenames)
+        self.assertEqual(sorted(wks.iter_tracked_subpaths()), filenames)
         wks.save()
         # return wks
 
@@ -101,12 +102,31 @@ class CoreTests(object):
         wks.save()
         # return wks
 
+    def test_iter_tracked_subpaths_updated(self):
+        wks = self.make_workspace()
+        fn1 = self.add_files_simple(wks)
+        self.assertEqual(list(wks.iter_tracked_subpaths()), [fn1])
+        fn2 = self.add_files_simple(wks)
+        # insertion order is retained, also for duplicates.
+        wks.add_file(fn1)
+        self.assertEqual(list(wks.iter_tracked_subpaths()), [fn1, fn2])
+        wks.reset()
+        self.assertEqual(list(wks.iter_tracked_subpaths()), [])
+
     def test_add_files_outside_workspace(self):
         wks = self.make_workspace()
         fn1 = self.write_file('Failure', join(self.working_dir, 'badname'))
         self.assertRaises(ValueError, wks.add_file, fn1)
         self.assertEqual(wks.get_tracked_subpaths(), [])
 
+    def test_add_files_sibling_with_common_prefix(self):
+        wks = self.make_workspace()
+        sibling = self.workspace_dir + 'extra'
+        os.mkdir(sibling)
+        fn1 = self.write_file('Failure', join(sibling, 'badname'))
+        self.assertRaises(ValueError, wks.add_file, fn1)
+        self.assertEqual(wks.get_tracked_subpaths(), [])
+
 
 def handle_access_error(func, path, exc_info):  # pragma: no cover
     """
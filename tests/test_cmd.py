@@ -16,6 +16,7 @@ try:
 except ImportError:
     pass
 
+from pmr2.wfctrl import core
 from pmr2.wfctrl.core import get_cmd_by_name
 from pmr2.wfctrl.core import CmdWorkspace
 from pmr2.wfctrl.cmd import GitDvcsCmd
@@ -261,11 +262,8 @@ class GitDvcsCmdTestCase(CoreTestCase, RawCmdTests):
         return GitDvcsCmd._execute(self.cmd._args(self.workspace, 'log'))
 
     def _ls_root(self, workspace=None):
-        branch, _, *_ = self.cmd.execute(
-            *self.cmd._args(self.workspace, 'branch', '--show-current'))
-        branch = branch.strip()
         return GitDvcsCmd._execute(
-            self.cmd._args(self.workspace, 'ls-tree', branch))
+            self.cmd._args(self.workspace, 'ls-tree', 'HEAD'))
 
     def _make_remote(self):
         target = os.path.join(self.working_dir, 'remote')
@@ -275,6 +273,127 @@ class GitDvcsCmdTestCase(CoreTestCase, RawCmdTests):
     def test_get_cmd_by_name(self):
         self.assertEqual(get_cmd_by_name('git'), self.cmdcls)
 
+    def _remote_log(self, remote):
+        stdout, stderr, return_code = GitDvcsCmd._execute(
+            ['--git-dir=%s' % remote, 'log'])
+        return stdout.decode('latin1')
+
+    def test_save_ignored_file(self):
+        self.cmd.init_new(self.workspace)
+        helper = CoreTests()
+        helper.workspace_dir = self.workspace_dir
+        self.cmd.set_committer('Tester', 'test@example.com')
+        self.workspace.add_file(helper.write_file('*.log\n', '.gitignore'))
+        self.workspace.add_file(helper.write_file('a', 'a.txt'))
+        self.workspace.add_file(helper.write_file('b', 'b.log'))
+        self.workspace.save(message='with ignored file')
+        stdout, stderr, return_code = self._call(self._log)
+        self.assertTrue('with ignored file' in stdout)
+        stdout, stderr, return_code = self._call(self._ls_root)
+        self.assertTrue('.gitignore' in stdout)
+        self.assertTrue('a.txt' in stdout)
+        self.assertFalse('b.log' in stdout)
+
+    def test_save_nothing_new_still_pushes(self):
+        self.cmd.init_new(self.workspace)
+        helper = CoreTests()
+        helper.workspace_dir = self.workspace_dir
+        self.cmd.set_committer('Tester', 'test@example.com')
+        helper.add_files_simple(self.workspace)
+        # no remote yet, so this commit is left unpushed.
+        self.workspace.save(message='unpushed commit')
+
+        remote = self._make_remote()
+        self.cmd.remote = remote
+        # nothing new to commit, but the push must still happen.
+        self.workspace.save(message='nothing new')
+        self.assertTrue('unpushed commit' in self._remote_log(remote))
+
+    def test_save_missing_path(self):
+        self.cmd.init_new(self.workspace)
+        helper = CoreTests()
+        helper.workspace_dir = self.workspace_dir
+        self.cmd.set_committer('Tester', 'test@example.com')
+        self.workspace.add_file(helper.write_file('a', 'a.txt'))
+        self.workspace.add_file(helper.write_file('gone', 'gone.txt'))
+        os.unlink(join(self.workspace_dir, 'gone.txt'))
+        self.workspace.save(message='with missing path')
+        stdout, stderr, return_code = self._call(self._log)
+        self.assertTrue('with missing path' in stdout)
+        stdout, stderr, return_code = self._call(self._ls_root)
+        self.assertTrue('a.txt' in stdout)
+        self.assertFalse('gone.txt' in stdout)
+
+    @skipIf(os.name != 'posix', 'batched save requires a POSIX shell')
+    def test_add_files_batched(self):
+        self.cmd._supports_batch = True
+        self.test_add_files()
+
+    @skipIf(os.name != 'posix', 'batched save requires a POSIX shell')
+    def test_add_files_batched_quoting(self):
+        self.cmd._supports_batch = True
+        self.cmd.init_new(self.workspace)
+        helper = CoreTests()
+        helper.workspace_dir = self.workspace_dir
+        files = helper.add_files_multi(self.workspace)
+        message = 'it\'s "$HOME" `true`; exit 1'
+        self.cmd.set_committer('Tester', 'test@example.com')
+        self.assertIsNone(self.workspace.save(message=message))
+        self.check_commit(files, message=message,
+                          committer='Tester <test@example.com>')
+
+    @skipIf(os.name != 'posix', 'batched save requires a POSIX shell')
+    def test_add_files_batched_too_long(self):
+        self.cmd._supports_batch = True
+        orig_arg_max, core._ARG_MAX = core._ARG_MAX, 16
+        try:
+            self.test_add_files()
+        finally:
+            core._ARG_MAX = orig_arg_max
+
+    @skipIf(os.name != 'posix', 'batched save requires a POSIX shell')
+    def test_add_files_batched_oserror(self):
+        self.cmd._supports_batch = True
+        execute = self.cmd.execute
+
+        def failing_execute(*a, **kw):
+            if kw.get('cmd_binary') == 'sh':
+                raise OSError(7, 'Argument list too long')
+            return execute(*a, **kw)
+
+        self.cmd.execute = failing_execute
+        self.test_add_files()
+
+    @skipIf(os.name != 'posix', 'batched save requires a POSIX shell')
+    def test_add_files_batched_non_ascii_too_long(self):
+        self.cmd._supports_batch = True
+        self.cmd.init_new(self.workspace)
+        helper = CoreTests()
+        helper.workspace_dir = self.workspace_dir
+        # below the limit in characters, above it in bytes.
+        names = ['%03d%s' % (i, '\xe9' * 120) for i in range(600)]
+        for name in names:
+            self.workspace.add_file(helper.write_file('', name))
+        self.cmd.set_committer('Tester', 'test@example.com')
+        self.workspace.save(message='non-ascii')
+        stdout, stderr, return_code = self._call(self._log)
+        self.assertTrue('non-ascii' in stdout)
+
+    @skipIf(os.name != 'posix', 'batched save requires a POSIX shell')
+    def test_save_ignored_file_batched(self):
+        self.cmd._supports_batch = True
+        self.test_save_ignored_file()
+
+    @skipIf(os.name != 'posix', 'batched save requires a POSIX shell')
+    def test_save_missing_path_batched(self):
+        self.cmd._supports_batch = True
+        self.test_save_missing_path()
+
+    @skipIf(os.name != 'posix', 'batched save requires a POSIX shell')
+    def test_save_nothing_new_still_pushes_batched(self):
+        self.cmd._supports_batch = True
+        self.test_save_nothing_new_still_pushes()
+
     @skipIf(DulwichDvcsCmd.available(), 'git is not available')
     def test_auto_init(self):  # pragma: no cover
         super(GitDvcsCmdTestCase, self).test_auto_init()
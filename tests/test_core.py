@@ -1,6 +1,8 @@
 from unittest import TestCase
 
 import os
+import pathlib
+import weakref
 from os.path import join
 
 from pmr2.wfctrl import core
@@ -38,6 +40,13 @@ class CoreCmdRegistrationTestCase(TestCase):
         core.register_cmd(TestCmd)
         self.assertEqual(len(core._cmd_classes), 1)
 
+    def test_get_cmd_by_name_follows_registry(self):
+        orig_names, core._cmd_names = core._cmd_names, {}
+        try:
+            self.assertIsNone(core.get_cmd_by_name('git'))
+        finally:
+            core._cmd_names = orig_names
+
     def test_register_unavail(self):
         class TestCmd(BaseCmd):
             marker = '.testmarker'
@@ -101,6 +110,63 @@ class BaseDvcsCmdBinTestCase(TestCase):
         self.assertRaises(NotImplementedError, cmd.reset_to_remote, workspace)
 
 
+class DummyActionTestCase(TestCase):
+
+    def test_dummy_action(self):
+        self.assertIsNone(core.dummy_action(None))
+        self.assertIsNone(core.dummy_action(None, message='message'))
+
+
+class FastNormpathTestCase(TestCase):
+
+    def test_fast_normpath(self):
+        for path in [
+                join(os.sep, 'a', 'b'),
+                os.sep.join(['', 'a', '', 'b']),
+                join(os.sep, 'a', '.', 'b'),
+                join(os.sep, 'a', '..', 'b'),
+                join(os.sep, 'a', 'b', ''),
+                join(os.sep, 'a', '.'),
+                join(os.sep, 'a', '..'),
+                join(os.sep, 'a', '.b'),
+                join(os.sep, 'a', '..b'),
+                ]:
+            self.assertEqual(core._fast_normpath(path), os.path.normpath(path))
+
+
+class IsdirTestCase(CoreTestCase):
+
+    def test_isdir(self):
+        self.assertTrue(core._isdir(self.workspace_dir))
+        self.assertFalse(core._isdir(join(self.workspace_dir, 'missing')))
+        with open(join(self.workspace_dir, 'file'), 'w') as fd:
+            fd.write('')
+        self.assertFalse(core._isdir(join(self.workspace_dir, 'file')))
+
+
+class ChunkPathsTestCase(TestCase):
+
+    def test_as_paths(self):
+        self.assertEqual(core._as_paths('a'), ['a'])
+        self.assertEqual(core._as_paths(('a', 'b')), ['a', 'b'])
+        self.assertEqual(core._as_paths(b'a'), [b'a'])
+        path = pathlib.PurePath('a', 'b')
+        self.assertEqual(core._as_paths(path), [path])
+
+    def test_chunk_paths(self):
+        self.assertEqual(list(core._chunk_paths([])), [])
+        self.assertEqual(list(core._chunk_paths(['a', 'b', 'c'])),
+            [['a', 'b', 'c']])
+        self.assertEqual(list(core._chunk_paths(['a', 'b', 'c'], limit=4)),
+            [['a', 'b'], ['c']])
+        # the limit is measured in bytes.
+        self.assertEqual(list(core._chunk_paths(['\xe9', 'b'], limit=4)),
+            [['\xe9'], ['b']])
+        # a single overlong path still gets its own chunk.
+        self.assertEqual(list(core._chunk_paths(['abcdef', 'g'], limit=4)),
+            [['abcdef'], ['g']])
+
+
 class BaseWorkspaceTestCase(TestCase):
 
     def setUp(self):
@@ -111,6 +177,67 @@ class BaseWorkspaceTestCase(TestCase):
         self.assertRaises(NotImplementedError, self.workspace.check_marker)
         self.assertRaises(NotImplementedError, self.workspace.save)
 
+    def test_slots(self):
+        self.assertFalse(hasattr(self.workspace, '__dict__'))
+        self.assertFalse(hasattr(Workspace('path'), '__dict__'))
+
+    def test_weakref(self):
+        self.assertIs(weakref.ref(self.workspace)(), self.workspace)
+        workspace = Workspace('path')
+        self.assertIs(weakref.ref(workspace)(), workspace)
+        cmd = BaseCmd()
+        self.assertIs(weakref.ref(cmd)(), cmd)
+        cmd = BaseDvcsCmd()
+        self.assertIs(weakref.ref(cmd)(), cmd)
+
+    def test_working_dir(self):
+        self.assertEqual(self.workspace.working_dir, os.path.abspath('path'))
+        root = os.path.abspath('root')
+        workspace = BaseWorkspace(join(root, 'a', '..', 'b'))
+        self.assertEqual(workspace.working_dir, join(root, 'b'))
+
+    def test_add_file_working_dir(self):
+        self.workspace.add_file('.')
+        self.workspace.add_file(self.workspace.working_dir)
+        self.assertEqual(self.workspace.get_tracked_subpaths(), [
+            self.workspace.working_dir])
+
+    def test_tracked_subpaths(self):
+        workspace = BaseWorkspace('path')
+        workspace.add_file('b')
+        workspace.add_file('a')
+        workspace.add_file('b')
+        root = os.path.abspath('path')
+        self.assertEqual(workspace.get_tracked_subpaths(), [
+            join(root, 'a'), join(root, 'b')])
+        self.assertEqual(list(workspace.iter_tracked_subpaths()), [
+            join(root, 'b'), join(root, 'a')])
+
+    def test_tracked_subpaths_cached(self):
+        workspace = BaseWorkspace('path')
+        root = os.path.abspath('path')
+        self.assertIsNone(workspace._sorted)
+        workspace.add_file('b')
+        result = workspace.get_tracked_subpaths()
+        # callers get their own copy of the cached result.
+        result.append('z')
+        self.assertEqual(workspace.get_tracked_subpaths(), [join(root, 'b')])
+        cached = workspace._sorted
+        # re-adding a tracked file keeps the cache.
+        workspace.add_file('b')
+        self.assertIs(workspace._sorted, cached)
+        workspace.add_file('a')
+        self.assertIsNone(workspace._sorted)
+        self.assertEqual(workspace.get_tracked_subpaths(), [
+            join(root, 'a'), join(root, 'b')])
+        workspace.reset()
+        self.assertEqual(workspace.get_tracked_subpaths(), [])
+
+    def test_add_file_relative(self):
+        self.workspace.add_file(join('a', '..', 'b', '.', 'c'))
+        self.assertEqual(self.workspace.get_tracked_subpaths(), [
+            join(os.path.abspath('path'), 'b', 'c')])
+
 
 class FileWorkspaceTestCase(CoreTestCase, CoreTests):
 
@@ -149,6 +276,35 @@ class BareCmdWorkspaceTestCase(CoreTestCase, CoreTests):
         wks = CmdWorkspace(self.workspace_dir, cmd)
         self.assertEqual(cmd.result, [])
 
+    def test_cmd_workspace_check_marker_cached(self):
+        cmd = _DummyCmd()
+        wks = CmdWorkspace(self.workspace_dir, cmd)
+        self.assertFalse(wks.check_marker())
+        os.mkdir(join(self.workspace_dir, _DummyCmd.marker))
+        self.assertTrue(wks.check_marker())
+        os.rmdir(join(self.workspace_dir, _DummyCmd.marker))
+        self.assertTrue(wks.check_marker())
+
+    def test_cmd_workspace_update_cmd_table(self):
+        wks = CmdWorkspace(self.workspace_dir)
+        cmd = _DummyCmd()
+        wks.cmd = cmd
+        wks.update_cmd_table(cmd)
+        self.assertFalse(wks.check_marker())
+        wks.initialize()
+        self.assertEqual(cmd.result, ['init'])
+
+    def test_cmd_workspace_update_cmd_table_resets_marker(self):
+        os.mkdir(join(self.workspace_dir, _DummyCmd.marker))
+        cmd = _DummyCmd()
+        wks = CmdWorkspace(self.workspace_dir, cmd)
+        self.assertTrue(wks.check_marker())
+        other = _DummyCmd()
+        other.marker = '.other'
+        wks.cmd = other
+        wks.update_cmd_table(other)
+        self.assertFalse(wks.check_marker())
+
     def test_cmd_workspace_no_marker_no_init(self):
         cmd = _DummyCmd()
         cmd.marker = None
@@ -57,6 +57,18 @@ class DemoVcsCmdWorkspaceTestCase(CoreTestCase, CoreTests):
             ['vcs', 'push'],
         ])
 
+    def test_cmd_add_files_multi(self):
+        wks = self.make_workspace()
+        filenames = self.add_files_multi(wks)
+        wks.save()
+        # all paths added using a single command, in the order added.
+        self.assertEqual(sorted(self.cmd.queue[0][2:]), filenames)
+        self.assertEqual(self.cmd.queue, [
+            ['vcs', 'add'] + list(wks.iter_tracked_subpaths()),
+            ['vcs', 'commit', '-m', ''],
+            ['vcs', 'push'],
+        ])
+
     def test_cmd_pull(self):
         wks = self.make_workspace()
         # TODO make a remote sync workflow of sort